@@ -1,3 +1,4 @@
 from MetricDB.src.main import MetricDB
+from MetricDB.src.pool import MetricDBPool
 
-__all__ = ["MetricDB"]
+__all__ = ["MetricDB", "MetricDBPool"]
@@ -1,57 +1,77 @@
 #!/Users/donyin/miniconda3/envs/imperial/bin/python
 
-import sqlite3, pandas
+import sqlite3, queue, threading, itertools, hashlib
 from rich import print
+from rich.table import Table
 from pathlib import Path
-from scipy import stats
+from contextlib import contextmanager
 
 
 class MetricDB:
-    def __init__(self, datafile_dir: str = "default.db", verbose: bool = True):
+    def __init__(
+        self, datafile_dir: str = "default.db", verbose: bool = True, commit_every: int = 1, background: bool = False
+    ):
         self.verbose, self.datafile_dir = verbose, Path(datafile_dir)
-        self.connect = sqlite3.connect(self.datafile_dir)
+        self.commit_every, self._num_pending, self._in_transaction, self._closed = commit_every, 0, False, False
+        is_existing = self.datafile_dir.exists()  # ---- checked before connect() creates the file ----
+        # ---- isolation_level=None: no implicit BEGIN from the sqlite3 module, transactions are opened below ----
+        self.connect = sqlite3.connect(
+            self.datafile_dir, cached_statements=512, isolation_level=None, check_same_thread=False
+        )
+        self._stmt_cache: dict[tuple, str] = {}  # (table, keys) -> INSERT sql
+        self._schema_cache: dict[str, set[str]] = {}  # table -> known columns
+        self._index_cache: set[str] = set()  # names of the indexes already ensured
+
+        # ---- [0] tune the connection for many small appends ----
+        self.connect.execute("PRAGMA journal_mode=WAL")
+        self.connect.execute("PRAGMA synchronous=NORMAL")
+        self.connect.execute("PRAGMA temp_store=MEMORY")
+        self.connect.execute("PRAGMA cache_size=-64000")
+        self.connect.execute("PRAGMA mmap_size=268435456")
 
         # ---- [1] reporting init progress ----
-        if not self.datafile_dir.exists() and self.verbose:
+        if not is_existing and self.verbose:
             print(f"[bold green]SQLite3[/bold green] datafile created at: {self.datafile_dir}")
 
-        if self.datafile_dir.exists() and self.verbose:
+        if is_existing and self.verbose:
             print(f"[bold green]SQLite3[/bold green] datafile loaded from: {self.datafile_dir}")
-            self.print_header()
+            self.print_summary()
+
+        # ---- [2] optional background writer: log() only enqueues, one thread does the inserts ----
+        self._queue, self._writer, self._writer_error = None, None, None
+        if background:
+            self._queue, self._writer_batch_size = queue.Queue(maxsize=10_000), 500
+            self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer.start()
 
     # ---- [ core functional helpers ] ----
     def get_moving_average(self, key: str, name_table: str = "main", window_size: int = 12):
         """get the moving average of the key from the table of the past window_size values that are not None"""
-        cursor = self.connect.cursor()
-
-        # ---- check if the key exists in the table ----
-        cursor.execute(f"PRAGMA table_info({name_table})")
-        columns = [col[1] for col in cursor.fetchall()]
+        self.flush()
+        # ---- the column is table-qualified so a missing key raises instead of reading as a string literal ----
+        column = f'{name_table}."{key}"'
+        # ---- only numbers (or numeric-looking text in legacy TEXT columns) count; AVG would read other text as 0 ----
+        query = f"""
+        SELECT AVG(value)
+        FROM (
+            SELECT {column} AS value FROM {name_table}
+            WHERE {column} IS NOT NULL AND (
+                typeof({column}) IN ('integer', 'real')
+                OR (typeof({column}) = 'text' AND trim({column}) GLOB '*[0-9]*' AND trim({column}) NOT GLOB '*[^0-9eE.+-]*')
+            )
+            ORDER BY id DESC LIMIT ?
+        )
+        """
 
-        if key not in columns:
+        try:
+            moving_average = self.connect.execute(query, (window_size,)).fetchone()[0]
+        except sqlite3.OperationalError:  # ---- missing table or column ----
             if self.verbose:
                 print(f"[bold yellow]Warning: Key '{key}' does not exist in table '{name_table}'. Returning 0.[/bold yellow]")
             return 0
 
-        # ---- continue ----
-        query = f"""
-        SELECT "{key}"
-        FROM {name_table}
-        WHERE "{key}" IS NOT NULL
-        ORDER BY id DESC
-        LIMIT {window_size}
-        """
-
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
-
-        if results:
-            values = [float(result[0]) for result in results if result[0] is not None]
-
-            if values:
-                moving_average = sum(values) / len(values)
-                return moving_average
+        if moving_average is not None:
+            return moving_average
 
         if self.verbose:
             print(
@@ -60,75 +80,276 @@ class MetricDB:
         return 0
 
     def log(self, data: dict, name_table: str = "main"):
-        cursor = self.connect.cursor()
-
-        # ---- [1] create table if not exists ----
-        columns = ", ".join([f'"{key}" TEXT' for key in data.keys()])
-        cursor.execute(
-            f"""
-        CREATE TABLE IF NOT EXISTS {name_table} (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            {columns}
-        )
-        """
-        )
+        """insert one row; committed right away by default, or every `commit_every` rows, at the end of a transaction, or on_end"""
+        self._check_open()
+        data = self._check_row(data)  # ---- a checked copy: bad values fail here, reused dicts stay safe to queue ----
+        if self._queue is not None and not self._in_transaction:
+            self._queue.put((name_table, data))  # ---- only blocks once the queue is full ----
+            if self.verbose:
+                print(f"[bold green]SQLite3[/bold green] Queued data for table: {name_table}: {data}")
+            return
 
-        # ---- [2] insert data into the table ----
-        cursor.execute(f"PRAGMA table_info({name_table})")
-        existing_columns = set(col[1] for col in cursor.fetchall())
+        if self.commit_every > 1 and not self.connect.in_transaction:
+            self.connect.execute("BEGIN")  # ---- commit_every=1 leaves each insert in autocommit mode ----
 
-        for key in data.keys():
-            if key not in existing_columns:
-                cursor.execute(f'ALTER TABLE {name_table} ADD COLUMN "{key}" TEXT')
+        keys = tuple(sorted(data))  # ---- same key set in any order -> same cached statement ----
+        self._prepare_table(name_table, data)
+        self.connect.execute(self._insert_sql(name_table, keys), tuple(data[key] for key in keys))
+        self._after_insert(1)
 
-        columns = ", ".join([f'"{key}"' for key in data.keys()])
-        placeholders = ", ".join(["?" for _ in data])
-        values = tuple(data.values())
+        if self.verbose:
+            print(f"[bold green]SQLite3[/bold green] Inserted data into table: {name_table}: {data}")
 
-        cursor.execute(
-            f"""
-        INSERT INTO {name_table} ({columns})
-        VALUES ({placeholders})
-        """,
-            values,
-        )
+    def log_many(self, rows: list[dict], name_table: str = "main"):
+        """insert many rows in a single transaction; rows sharing the same keys go through one executemany.
+        as with transaction(), rows inserted before a failing one are kept"""
+        with self.transaction():
+            self._insert_batch([(name_table, self._check_row(data)) for data in rows])
 
+        if self.verbose:
+            print(f"[bold green]SQLite3[/bold green] Inserted {len(rows)} rows into table: {name_table}")
+
+    # ---- [ transaction control ] ----
+    def begin(self):
+        """open an explicit write transaction; rows logged until commit() are written in one go"""
+        self.flush()
+        if self.connect.in_transaction:
+            self.connect.commit()
+        self.connect.execute("BEGIN IMMEDIATE")
+        self._in_transaction = True
+
+    def commit(self):
+        self.flush()  # ---- the writer thread must not be mid-transaction on the shared connection ----
         self.connect.commit()
+        self._num_pending, self._in_transaction = 0, False
 
-        if self.verbose:
-            print(f"[bold green]SQLite3[/bold green] Inserted data into table: {name_table}: {data}")
+    @contextmanager
+    def transaction(self):
+        """
+        wrap a block of log() calls in one transaction; nested use joins the outer transaction.
+        it is a batching tool, not an all-or-nothing unit: whatever the block raises (a training error,
+        Ctrl-C, a failed insert), the rows logged before it are committed and the exception re-raised.
+        """
+        if self._in_transaction:
+            yield self
+            return
+
+        self.begin()
+        try:
+            yield self
+        finally:
+            if not self.connect.in_transaction:  # ---- SQLite itself rolled back (e.g. disk full) ----
+                self._schema_cache.clear()  # rolled back DDL would leave the caches stale
+                self._index_cache.clear()
+            self.commit()
+
+    def flush(self):
+        """block until every row queued for the background writer is committed"""
+        self._check_open()
+        if self._queue is None:
+            return
+
+        self._queue.join()
+        if self._writer_error is not None:
+            error, self._writer_error = self._writer_error, None
+            raise error
+
+    def _check_open(self):
+        """after on_end the writer is gone, so a queued row would be lost and flush() would wait forever"""
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"Cannot operate on a closed MetricDB: {self.datafile_dir}")
+
+    def _writer_loop(self):
+        """drain up to _writer_batch_size queued rows at a time and write each batch in one short transaction"""
+        while True:
+            items = [self._queue.get()]
+            while len(items) < self._writer_batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [item for item in items if item is not None]  # ---- None is the stop sentinel ----
+            try:
+                if rows:
+                    self.connect.execute("BEGIN IMMEDIATE")
+                    self._insert_batch(rows)
+                    self.connect.execute("COMMIT")
+            except Exception:
+                self._rollback_writer()
+                self._retry_rows(rows)
+
+            for _ in items:
+                self._queue.task_done()
+            if len(rows) < len(items):
+                return
+
+    def _retry_rows(self, rows: list[tuple[str, dict]]):
+        """after a failed batch, write its rows one by one so only the failing ones are dropped"""
+        for row in rows:
+            try:
+                self.connect.execute("BEGIN IMMEDIATE")
+                self._insert_batch([row])
+                self.connect.execute("COMMIT")
+            except Exception as e:
+                self._rollback_writer()
+                self._writer_error = e
+
+    def _rollback_writer(self):
+        if self.connect.in_transaction:
+            self.connect.rollback()
+        self._schema_cache.clear()  # rolled back DDL would leave the caches stale
+        self._index_cache.clear()
+
+    @staticmethod
+    def _check_row(data: dict) -> dict:
+        """
+        copy of data with values sqlite3 can bind: native types and any type with a registered adapter
+        (datetime / date by default) pass through, numpy / torch scalars are unwrapped with .item()
+        """
+        row = {}
+        for key, value in data.items():
+            if not MetricDB._is_bindable(value) and callable(getattr(value, "item", None)):
+                value = value.item()
+            if not MetricDB._is_bindable(value):
+                raise TypeError(f"Cannot log '{key}' of type {type(value).__name__}; sqlite3 has no adapter for it.")
+            row[key] = value
+        return row
+
+    @staticmethod
+    def _is_bindable(value) -> bool:
+        if value is None or isinstance(value, (int, float, str, bytes, bytearray, memoryview)):
+            return True
+        return (type(value), sqlite3.PrepareProtocol) in sqlite3.adapters
+
+    def _insert_batch(self, items: list[tuple[str, dict]]):
+        """insert (name_table, data) pairs in order; consecutive rows with the same table and keys share one executemany"""
+        for (name_table, keys), run in itertools.groupby(items, key=lambda item: (item[0], tuple(sorted(item[1])))):
+            run = [data for _, data in run]
+            self._prepare_table(name_table, run[0])
+            self.connect.executemany(self._insert_sql(name_table, keys), [tuple(data[key] for key in keys) for data in run])
+
+    def _prepare_table(self, name_table: str, data: dict):
+        """create the table if needed and add any missing columns, typed after the values in data"""
+        known_columns = self._schema_cache.get(name_table)
+        missing = set(data) - known_columns if known_columns is not None else set(data)
+        if not missing:
+            return
+
+        # ---- [1] create table if not exists; skipped for tables already seen by this connection ----
+        if known_columns is None:
+            columns = ", ".join([f'"{key}" {self._sql_type(value)}' for key, value in data.items()])
+            self.connect.execute(
+                f"""
+            CREATE TABLE IF NOT EXISTS {name_table} (
+                id INTEGER PRIMARY KEY,
+                {columns}
+            )
+            """
+            )
+
+        # ---- [2] add the columns that are missing ----
+        existing_columns = set(col[1] for col in self.connect.execute(f"PRAGMA table_info({name_table})").fetchall())
 
-        cursor.close()
+        for key, value in data.items():
+            if key not in missing:
+                continue
+            if key not in existing_columns:
+                try:
+                    self.connect.execute(f'ALTER TABLE {name_table} ADD COLUMN "{key}" {self._sql_type(value)}')
+                except sqlite3.OperationalError as e:  # ---- another connection added it first ----
+                    if "duplicate column" not in str(e):
+                        raise
+                existing_columns.add(key)
+            self._ensure_index(name_table, key)
+
+        self._schema_cache[name_table] = existing_columns
+
+    @staticmethod
+    def _sql_type(value) -> str:
+        """column type for a first seen value, so numbers are stored natively rather than as text"""
+        if isinstance(value, (bool, int)):
+            return "INTEGER"
+        if isinstance(value, float):
+            return "REAL"
+        return "TEXT"
+
+    def _ensure_index(self, name_table: str, key: str):
+        """partial (id, key) index so the latest non-null values of a key are a short backward index scan"""
+        # ---- hash of (table, key) since "a_b"+"c" and "a"+"b_c" would otherwise share a name ----
+        digest = hashlib.sha1(repr((name_table, key)).encode()).hexdigest()[:16]
+        name_index = f"idx_{name_table}_notnull_{digest}"
+        if name_index in self._index_cache:
+            return
+
+        self.connect.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name_index}" ON {name_table}(id, "{key}") WHERE "{key}" IS NOT NULL'
+        )
+        self._index_cache.add(name_index)
+
+    def _insert_sql(self, name_table: str, keys: tuple) -> str:
+        """build the INSERT statement once per (table, sorted keys) so sqlite3 reuses its compiled statement"""
+        sql = self._stmt_cache.get((name_table, keys))
+        if sql is None:
+            columns = ", ".join([f'"{key}"' for key in keys])
+            placeholders = ", ".join(["?" for _ in keys])
+            sql = f"INSERT INTO {name_table} ({columns}) VALUES ({placeholders})"
+            self._stmt_cache[(name_table, keys)] = sql
+        return sql
+
+    def _after_insert(self, num_rows: int):
+        self._num_pending += num_rows
+        if not self._in_transaction and self._num_pending >= self.commit_every:
+            self.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """commit whatever was logged, even when the block raised, then close the connection"""
+        try:
+            self.on_end()
+        except Exception:
+            if exc_type is None:  # ---- never replace the exception raised inside the block ----
+                raise
 
     def on_end(self):
+        """commit and close; safe to call more than once"""
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+
+        self.connect.commit()
+        self._num_pending, self._in_transaction = 0, False
         self.connect.close()
         if self.verbose:
             print(f"[bold green]SQLite3[/bold green] connection closed for: {self.datafile_dir}")
 
+        if self._writer_error is not None:
+            error, self._writer_error = self._writer_error, None
+            raise error
+
     # --- [ other useful helpers ] ---
-    def save_as_csv(self, name_table: str = "main", save_dir: Path = "default.csv"):
+    def save_as_csv(self, name_table: str = "main", save_dir: Path = "default.csv", chunksize: int = 100_000):
         """
         Save the specified table as a pandas DataFrame and export it to a CSV file.
+        A save_dir ending in ".parquet" is written as Parquet instead (requires pyarrow or fastparquet).
 
         Args:
             name_table (str): The name of the table to save. Defaults to "main".
             save_dir (Path): The path where the CSV file will be saved. Defaults to "main.csv".
+            chunksize (int): Rows read and written per CSV chunk, so memory does not grow with the table. Defaults to 100_000.
         """
-
-        cursor = self.connect.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (name_table,))
-
-        if not cursor.fetchone():
-            raise ValueError(f"Table '{name_table}' does not exist in the database.")
-
-        cursor.execute(f"SELECT * FROM {name_table}")
-        rows = cursor.fetchall()
-
-        cursor.execute(f"PRAGMA table_info({name_table})")
-        columns = [col[1] for col in cursor.fetchall()]
-        df = pandas.DataFrame(rows, columns=columns)
-        df.to_csv(save_dir, index=False)
-        cursor.close()
+        if Path(save_dir).suffix == ".parquet":
+            self._convert_dtypes(self._read_table(name_table), downcast=True).to_parquet(save_dir, index=False)
+        else:
+            dtype = self._column_dtypes(name_table)  # ---- fixed per column so every chunk is written alike ----
+            for i, chunk in enumerate(self._read_table(name_table, chunksize=chunksize, dtype=dtype)):
+                chunk.to_csv(save_dir, mode="w" if i == 0 else "a", header=i == 0, index=False)
 
         if self.verbose:
             print(f"[bold green]SQLite3[/bold green] Saved table '{name_table}' to {save_dir}")
@@ -142,21 +363,58 @@ class MetricDB:
         Returns:
             pandas.DataFrame: The table data as a pandas DataFrame with proper data types.
         """
-        cursor = self.connect.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (name_table,))
+        df = self._convert_dtypes(self._read_table(name_table))
 
-        if not cursor.fetchone():
-            existing_tables = [table[0] for table in cursor.fetchall()]
+        if self.verbose:
+            print(f"[bold green]SQLite3[/bold green] Retrieved table '{name_table}' as pandas DataFrame")
+            print("Column dtypes:")
+            for col, dtype in df.dtypes.items():
+                print(f"  {col}: {dtype}")
+
+        return df
+
+    def _read_table(self, name_table: str, chunksize: int = None, dtype: dict = None):
+        """read a whole table column-wise through pandas.read_sql_query; an iterator of DataFrames if chunksize is set"""
+        import pandas  # ---- imported lazily so logging never pays for it ----
+
+        self.flush()
+        if not self.connect.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (name_table,)).fetchone():
+            existing_tables = [table[0] for table in self.connect.execute("SELECT name FROM sqlite_master WHERE type='table'")]
             raise ValueError(f"Table '{name_table}' does not exist in the database. Existing tables: {existing_tables}")
 
-        cursor.execute(f"SELECT * FROM {name_table}")
-        rows = cursor.fetchall()
+        return pandas.read_sql_query(f"SELECT * FROM {name_table}", self.connect, chunksize=chunksize, dtype=dtype)
+
+    def _column_dtypes(self, name_table: str) -> dict:
+        """pandas dtype per column from the storage classes actually stored: integers only -> Int64, any real -> float64"""
+        self.flush()
+        columns = [col[1] for col in self.connect.execute(f"PRAGMA table_info({name_table})").fetchall()]
+        if not columns:
+            return {}
 
-        cursor.execute(f"PRAGMA table_info({name_table})")
-        columns = [col[1] for col in cursor.fetchall()]
-        df = pandas.DataFrame(rows, columns=columns)
+        flags = ", ".join(
+            [
+                f"MAX(typeof(\"{col}\") = 'integer'), MAX(typeof(\"{col}\") = 'real'), MAX(typeof(\"{col}\") IN ('text', 'blob'))"
+                for col in columns
+            ]
+        )
+        row = self.connect.execute(f"SELECT {flags} FROM {name_table}").fetchone()
+
+        dtypes = {}
+        for i, col in enumerate(columns):
+            has_integer, has_real, has_other = row[3 * i : 3 * i + 3]
+            if has_other:
+                continue
+            if has_real:
+                dtypes[col] = "float64"
+            elif has_integer:
+                dtypes[col] = "Int64"
+        return dtypes
+
+    @staticmethod
+    def _convert_dtypes(df, downcast: bool = False):
+        """convert each column to its numeric or string type; with downcast, integer columns use the smallest dtype"""
+        import pandas
 
-        # ---- convert types for each column ----
         for column in df.columns:
             # ---- [1] try numeric conversion first ----
             try:
@@ -168,6 +426,8 @@ class MetricDB:
                     continue
 
                 numeric_series = pandas.to_numeric(df[column], errors="raise")
+                if downcast and numeric_series.dtype.kind in "iu":
+                    numeric_series = pandas.to_numeric(numeric_series, downcast="integer")
                 df[column] = numeric_series
                 continue
             except (ValueError, TypeError):
@@ -183,37 +443,34 @@ class MetricDB:
                         # Fallback to treating as string
                         df[column] = df[column].astype(str)
 
-        if self.verbose:
-            print(f"[bold green]SQLite3[/bold green] Retrieved table '{name_table}' as pandas DataFrame")
-            print("Column dtypes:")
-            for col, dtype in df.dtypes.items():
-                print(f"  {col}: {dtype}")
-
-        cursor.close()
         return df
 
     # ---- for debugging ----
-    def print_header(self):
-        """of all existing tables in the database"""
-        cursor = self.connect.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
+    def print_summary(self):
+        """name and row count of all existing tables, without reading their rows"""
+        tables = self.connect.execute("SELECT name FROM sqlite_master WHERE type='table';").fetchall()
+        for table in tables:
+            num_rows = self.connect.execute(f"SELECT COUNT(*) FROM {table[0]}").fetchone()[0]
+            print(f"  [bold cyan]{table[0]}[/bold cyan]: {num_rows} rows")
+
+    def print_header(self, num_rows: int = 20):
+        """of all existing tables in the database, showing the first num_rows rows of each"""
+        self.flush()
+        tables = self.connect.execute("SELECT name FROM sqlite_master WHERE type='table';").fetchall()
         if tables:
             for table in tables:
                 print(f"\n[bold cyan]Table: {table[0]}[/bold cyan]")
 
-                cursor.execute(f"PRAGMA table_info({table[0]})")
-                columns = cursor.fetchall()
-                column_names = [col[1] for col in columns]
+                cursor = self.connect.execute(f"SELECT * FROM {table[0]} LIMIT ?", (num_rows,))
+                rich_table = Table(*[col[0] for col in cursor.description])
+                for row in cursor:
+                    rich_table.add_row(*[str(value) for value in row])
 
-                cursor.execute(f"SELECT * FROM {table[0]}")
-                rows = cursor.fetchall()
-
-                df = pandas.DataFrame(rows, columns=column_names)
-                print(f"{df}\n\nDataFrame Shape: {df.shape}")
+                num_total = self.connect.execute(f"SELECT COUNT(*) FROM {table[0]}").fetchone()[0]
+                print(rich_table)
+                print(f"Shape: ({num_total}, {len(cursor.description)})")
         else:
             print("  No tables found in the database.")
-        cursor.close()
 
     def show_last_row(self, name_table: str = "main"):
         """
@@ -222,30 +479,28 @@ class MetricDB:
         Args:
             name_table (str): The name of the table to show the last row from. Defaults to "main".
         """
+        self.flush()
         cursor = self.connect.cursor()
-
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (name_table,))
-        if not cursor.fetchone():
-            raise ValueError(f"Table '{name_table}' does not exist in the database.")
-
-        cursor.execute(f"PRAGMA table_info({name_table})")
-        columns = [col[1] for col in cursor.fetchall()]
-        cursor.execute(f"SELECT * FROM {name_table} ORDER BY rowid DESC LIMIT 1")
-        last_row = cursor.fetchone()
+        cursor.row_factory = sqlite3.Row  # ---- column names come with the row, no PRAGMA needed ----
+        try:
+            last_row = cursor.execute(
+                f"SELECT * FROM {name_table} WHERE rowid = (SELECT max(rowid) FROM {name_table})"
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            if "no such table" in str(e):
+                raise ValueError(f"Table '{name_table}' does not exist in the database.") from e
+            raise
 
         if last_row:
-            last_row_dict = dict(zip(columns, last_row))
-            print(last_row_dict)
+            print(dict(last_row))
         else:
             if self.verbose:
                 print(f"[bold yellow]Table '{name_table}' is empty.[/bold yellow]")
-        cursor.close()
 
     # ---- development only ----
     def _write_dummy_data(self, name_table: str = "dummy_table"):
-        cursor = self.connect.cursor()
-
-        cursor.execute(
+        self.flush()
+        self.connect.execute(
             f"""
         CREATE TABLE IF NOT EXISTS {name_table} (
             id INTEGER PRIMARY KEY,
@@ -258,7 +513,7 @@ class MetricDB:
 
         dummy_data = [("Alice", 42.5), ("Bob", 37.2), ("Charlie", 55.8), ("Diana", 29.9), ("Ethan", 61.3)]
 
-        cursor.executemany(
+        self.connect.executemany(
             f"""
         INSERT INTO {name_table} (name, value)
         VALUES (?, ?)
@@ -267,7 +522,6 @@ class MetricDB:
         )
 
         self.connect.commit()
-        cursor.close()
 
         if self.verbose:
             print(f"[bold green]Dummy data inserted successfully into {name_table}![/bold green]")
@@ -293,14 +547,13 @@ class MetricDB:
             threshold_ratio: How much larger the short MA needs to be vs long MA to indicate improvement
             min_points: Minimum number of data points needed before checking for plateau
         """
-        cursor = self.connect.cursor()
-
+        self.flush()
         # Create table if it doesn't exist
-        cursor.execute(
+        self.connect.execute(
             f"""
             CREATE TABLE IF NOT EXISTS {name_table} (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                "{key}" TEXT
+                id INTEGER PRIMARY KEY,
+                "{key}" REAL
             )
             """
         )
@@ -313,9 +566,7 @@ class MetricDB:
         LIMIT {window_long}
         """
 
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
+        results = self.connect.execute(query).fetchall()
 
         if not results:
             if self.verbose:
@@ -354,64 +605,60 @@ class MetricDB:
 
 
 if __name__ == "__main__":
-    # logger = MetricDB("default.db", verbose=True)
-    # # logger._write_dummy_data()
-
-    # logger.log({"epoch": 1})
-    # for i in range(1000):
-    #     logger.log({"train loss": i})
-    #     logger.log({"train accuracy": i / 1000})
-    #     logger.log({"val loss": i}, name_table="val")
-    #     loss = logger.get_moving_average(key="train loss")
-    #     print(f"Moving Average of train loss: {loss}")
-
-    # # logger.print_header()
-    # # logger.save_as_csv(name_table="train", save_dir="train.csv")
-    # logger.show_last_row()
-    # logger.on_end()
-
-    # logger = MetricDB("default.db", verbose=True)
-    # logger.print_header()
-    # # logger.get_moving_average(key="Valid Accuracy Balanced")
-
-    # # ---- [1] Demo numeric encoding issue ----
-    # logger.log({"age": 25.1})
-    # logger.log({"name": "Alice"})
-    # df = logger.get_dataframe()
-    # # ---- [2] All conversions are handled automatically ----
-    # print(df)
-    # logger.on_end()
+    # with MetricDB("default.db", verbose=True) as logger:
+    #     # logger._write_dummy_data()
+
+    #     logger.log({"epoch": 1})
+    #     with logger.transaction():
+    #         for i in range(1000):
+    #             logger.log({"train loss": i})
+    #             logger.log({"train accuracy": i / 1000})
+    #             logger.log({"val loss": i}, name_table="val")
+    #             loss = logger.get_moving_average(key="train loss")
+    #             print(f"Moving Average of train loss: {loss}")
+
+    #     # logger.print_header()
+    #     # logger.save_as_csv(name_table="train", save_dir="train.csv")
+    #     logger.show_last_row()
+
+    # with MetricDB("default.db", verbose=True) as logger:
+    #     logger.print_header()
+    #     # logger.get_moving_average(key="Valid Accuracy Balanced")
+
+    #     # ---- [1] Demo numeric encoding issue ----
+    #     logger.log({"age": 25.1})
+    #     logger.log({"name": "Alice"})
+    #     df = logger.get_dataframe()
+    #     # ---- [2] All conversions are handled automatically ----
+    #     print(df)
 
     # Test has_plateaued with synthetic data using known functions
-    logger = MetricDB("test_plateau.db", verbose=True)
-
     # Test case 1: Logistic function (natural plateau)
     # f(x) = L / (1 + e^(-k(x-x0))) where L=1, k=1, x0=5
     def logistic(x):
         return 1 / (1 + 2.71828 ** (-1 * (x - 5)))
 
-    print("\nTesting logistic function plateau:")
-    for x in range(64):
-        logger.log({"logistic_metric": logistic(x)})
-    is_plateau = logger.has_plateaued("logistic_metric")
-    print(f"Has plateaued: {is_plateau}")
+    with MetricDB("test_plateau.db", verbose=True) as logger:
+        print("\nTesting logistic function plateau:")
+        for x in range(64):
+            logger.log({"logistic_metric": logistic(x)})
+        is_plateau = logger.has_plateaued("logistic_metric")
+        print(f"Has plateaued: {is_plateau}")
 
     # Test case 2: Exponential decay (asymptotic plateau)
     # f(x) = e^(-0.5x)
-    logger = MetricDB("test_exp.db", verbose=True)
-    print("\nTesting exponential decay plateau:")
-    for x in range(64):
-        logger.log({"exp_metric": 2.71828 ** (-0.5 * x)})
-    is_plateau = logger.has_plateaued("exp_metric")
-    print(f"Has plateaued: {is_plateau}")
+    with MetricDB("test_exp.db", verbose=True) as logger:
+        print("\nTesting exponential decay plateau:")
+        for x in range(64):
+            logger.log({"exp_metric": 2.71828 ** (-0.5 * x)})
+        is_plateau = logger.has_plateaued("exp_metric")
+        print(f"Has plateaued: {is_plateau}")
 
     # Test case 3: Linear function (no plateau)
     # f(x) = 0.5x
-    logger = MetricDB("test_linear.db", verbose=True)
-    print("\nTesting linear function (should not plateau):")
-    for x in range(64):
-        logger.log({"linear_metric": 0.5 * x})
-    is_plateau = logger.has_plateaued("linear_metric")
-    print(f"Has plateaued: {is_plateau}")
-
-    logger.on_end()
+    with MetricDB("test_linear.db", verbose=True) as logger:
+        print("\nTesting linear function (should not plateau):")
+        for x in range(64):
+            logger.log({"linear_metric": 0.5 * x})
+        is_plateau = logger.has_plateaued("linear_metric")
+        print(f"Has plateaued: {is_plateau}")
@@ -0,0 +1,66 @@
+import os, threading
+from rich import print
+from pathlib import Path
+from typing import Callable
+from MetricDB.src.main import MetricDB
+
+
+class MetricDBPool:
+    """
+    Hand out one MetricDB connection per thread (and per process) so concurrent workers never share a connection.
+
+    Args:
+        datafile_dir (str): The datafile used when no shard_key is given. Defaults to "default.db".
+        shard_key (Callable): Optional function mapping a table name to the datafile it is stored in,
+            e.g. lambda name_table: "analytics.db" if name_table == "analytics" else "main.db".
+        **kwargs: Passed on to every MetricDB.
+    """
+
+    def __init__(self, datafile_dir: str = "default.db", shard_key: Callable[[str], str] = None, **kwargs):
+        self.datafile_dir, self.shard_key = Path(datafile_dir), shard_key
+        self.kwargs = kwargs
+        self._local, self._lock, self._loggers = threading.local(), threading.Lock(), []
+
+    def get(self, name_table: str = "main") -> MetricDB:
+        """the calling thread's MetricDB for the datafile that holds name_table"""
+        datafile_dir = Path(self.shard_key(name_table)) if self.shard_key else self.datafile_dir
+
+        # ---- a forked child inherits the parent's thread-local, so connections are also keyed by pid ----
+        loggers = getattr(self._local, "loggers", None)
+        if loggers is None or self._local.pid != os.getpid():
+            self._local.loggers, self._local.pid = {}, os.getpid()
+            loggers = self._local.loggers
+
+        if datafile_dir not in loggers:
+            loggers[datafile_dir] = MetricDB(datafile_dir, **self.kwargs)
+            with self._lock:
+                self._loggers.append((os.getpid(), loggers[datafile_dir]))
+        return loggers[datafile_dir]
+
+    def log(self, data: dict, name_table: str = "main"):
+        self.get(name_table).log(data, name_table=name_table)
+
+    def log_many(self, rows: list[dict], name_table: str = "main"):
+        self.get(name_table).log_many(rows, name_table=name_table)
+
+    def get_moving_average(self, key: str, name_table: str = "main", window_size: int = 12):
+        return self.get(name_table).get_moving_average(key, name_table=name_table, window_size=window_size)
+
+    def on_end(self):
+        """close every connection opened by this pool in this process"""
+        with self._lock:
+            loggers = [logger for pid, logger in self._loggers if pid == os.getpid()]
+            self._loggers = []
+
+        for logger in loggers:
+            logger.on_end()
+        self._local = threading.local()
+
+        if self.kwargs.get("verbose", True):
+            print(f"[bold green]SQLite3[/bold green] pool closed {len(loggers)} connections")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.on_end()